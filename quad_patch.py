@@ -11,40 +11,196 @@
 
 import maya.cmds as mc
 import maya.mel as mel
-import re, math
-from collections import defaultdict
+import maya.api.OpenMaya as om
+import re
+import contextlib
+import numpy as np
+from collections import Counter
+
+_NUM_RE = re.compile(r'\d+')
+_COMP_RE = re.compile(r'\.(?:e|vtx)\[(\d+)\]')
+
+@contextlib.contextmanager
+def _fast_maya(chunkName='instantQPatch'):
+    # no viewport redraw while the patch is built, and one undo step for it
+    mc.undoInfo(openChunk=True, chunkName=chunkName)
+    mc.refresh(suspend=True)
+    try:
+        yield
+    finally:
+        mc.refresh(suspend=False)
+        mc.undoInfo(closeChunk=True)
+        mc.refresh()
+
+@contextlib.contextmanager
+def _dg_evaluation():
+    # evaluate in DG mode during topology edits so the parallel evaluation
+    # graph is rebuilt once afterwards instead of after every edit
+    mode = mc.evaluationManager(q=True, mode=True)[0]
+    if mode != 'off':
+        mc.evaluationManager(mode='off')
+    try:
+        yield
+    finally:
+        if mode != 'off':
+            mc.evaluationManager(mode=mode)
+
+def _unite_patch(selGeo, name):
+    # combine the selected patch with selGeo, weld it and conform normals
+    with _dg_evaluation():
+        mc.select(selGeo, add=True)
+        mc.polyUnite(ch=0, mergeUVSets=1, name=name)
+        newName = mc.ls(selection=True)
+        mc.polyMergeVertex(distance= 0.001, am=True, ch=0)
+        mc.rename(newName[0], name)
+        mc.polyNormal(name,normalMode=2, userNormalMode=0, ch=0)
+        mc.SetToFaceNormals()
+
+def _selected_edges():
+    # active edge selection as 'transform.e[i]' names, read from the API
+    # instead of flattening the whole selection through mc.ls
+    edges = []
+    it = om.MItSelectionList(om.MGlobal.getActiveSelectionList(), om.MFn.kMeshEdgeComponent)
+    while not it.isDone():
+        dagPath, comp = it.getComponent()
+        node = om.MFnDagNode(dagPath.transform()).partialPathName()
+        edges.extend(f"{node}.e[{i}]" for i in om.MFnSingleIndexedComponent(comp).getElements())
+        it.next()
+    return edges
+
+def _split_border_edges(edges):
+    # (inner, border) edge ids of the given edges, classified by
+    # MItMeshEdge.onBoundary() without touching the selection
+    sel = om.MSelectionList()
+    for e in edges:
+        sel.add(e)
+    inner, border = [], []
+    it = om.MItSelectionList(sel, om.MFn.kMeshEdgeComponent)
+    while not it.isDone():
+        dagPath, comp = it.getComponent()
+        itEdge = om.MItMeshEdge(dagPath, comp)
+        while not itEdge.isDone():
+            (border if itEdge.onBoundary() else inner).append(itEdge.index())
+            itEdge.next()
+        it.next()
+    return inner, border
+
+def _parse_polyinfo(lines):
+    # 'EDGE 12: 4 5 Hard' -> (12, 4, 5), 'VERTEX 4: 12 13 14' -> (4, 12, 13, 14)
+    return [tuple(map(int, _NUM_RE.findall(line))) for line in lines or []]
+
+def _points_by_id(comp, ids):
+    # {vertex id: world position} for just the given ids; the mesh shape comes
+    # from the component itself, so an extra Orig shape under the transform
+    # doesn't matter (a component list xform query gets merged/sorted by Maya)
+    sel = om.MSelectionList()
+    sel.add(comp)
+    fnMesh = om.MFnMesh(sel.getComponent(0)[0])
+    points = {}
+    for i in ids:
+        if i not in points:
+            p = fnMesh.getPoint(i, om.MSpace.kWorld)
+            points[i] = (p.x, p.y, p.z)
+    return points
+
+def _vtx_positions(vtx_list):
+    if not vtx_list:
+        return np.zeros((0, 3))
+    idx = [int(_COMP_RE.search(v).group(1)) for v in vtx_list]
+    points = _points_by_id(vtx_list[0], idx)
+    return np.array([points[i] for i in idx], dtype=np.float64).reshape(-1, 3)
+
+def _positions_by_id(vtx_list, pts):
+    # {vertex id: position} from an already queried vertex list
+    return {int(_COMP_RE.search(v).group(1)): p for v, p in zip(vtx_list, pts.tolist())}
+
+def _segments_positions(segments, lookup=None):
+    # positions for every segment from one query (or from the caller's
+    # {vtx: position} lookup), split back per segment
+    all_v = [v for seg in segments for v in seg]
+    if lookup is None:
+        P = _vtx_positions(all_v).tolist()
+    else:
+        P = [lookup[v] for v in all_v]
+    segments_pos = []
+    start = 0
+    for seg in segments:
+        segments_pos.append(P[start:start + len(seg)])
+        start += len(seg)
+    return segments_pos
+
+_NUMBA_MIN_POINTS = 512
+
+_ANGLES_KERNEL = None
+
+def _angles_kernel():
+    # optional numba JIT kernel for dense loops, imported and compiled only the
+    # first time one shows up (False when numba is missing); caching needs a
+    # real file, which a script pasted into the Script Editor does not have
+    global _ANGLES_KERNEL
+    if _ANGLES_KERNEL is None:
+        try:
+            from numba import njit, prange
+        except ImportError:
+            _ANGLES_KERNEL = False
+            return _ANGLES_KERNEL
+
+        @njit(parallel=True, fastmath=True, cache='__file__' in globals())
+        def kernel(prev_pt, cur, next_pt):
+            n = cur.shape[0]
+            out = np.empty(n)
+            for i in prange(n):
+                ax = prev_pt[i, 0] - cur[i, 0]
+                ay = prev_pt[i, 1] - cur[i, 1]
+                az = prev_pt[i, 2] - cur[i, 2]
+                bx = next_pt[i, 0] - cur[i, 0]
+                by = next_pt[i, 1] - cur[i, 1]
+                bz = next_pt[i, 2] - cur[i, 2]
+                m = np.sqrt(ax * ax + ay * ay + az * az) * np.sqrt(bx * bx + by * by + bz * bz)
+                if m == 0.0:
+                    out[i] = 90.0
+                else:
+                    c = (ax * bx + ay * by + az * bz) / m
+                    out[i] = np.degrees(np.arccos(min(1.0, max(-1.0, c))))
+            return out
+        _ANGLES_KERNEL = kernel
+    return _ANGLES_KERNEL
+
+def _compute_angles(pts, closed):
+    # corner angle and its deviation from 90 at every point of the loop;
+    # open loop ends count as straight (180), degenerate corners as 90
+    n = len(pts)
+    if closed:
+        cur = pts
+        prev_pt = np.roll(pts, 1, axis=0)
+        next_pt = np.roll(pts, -1, axis=0)
+    else:
+        cur = pts[1:-1]
+        prev_pt = pts[:-2]
+        next_pt = pts[2:]
+    kernel = _angles_kernel() if len(cur) > _NUMBA_MIN_POINTS else False
+    if kernel:
+        inner = kernel(prev_pt, cur, next_pt)
+    else:
+        v1 = prev_pt - cur
+        v2 = next_pt - cur
+        m = np.linalg.norm(v1, axis=1) * np.linalg.norm(v2, axis=1)
+        cosang = np.einsum('ij,ij->i', v1, v2) / np.where(m == 0, 1.0, m)
+        inner = np.where(m == 0, 90.0, np.degrees(np.arccos(np.clip(cosang, -1.0, 1.0))))
+    if closed:
+        angles = inner
+    else:
+        angles = np.full(n, 180.0)
+        angles[1:-1] = inner
+    return angles, np.abs(angles - 90.0)
 
 def checkFlatLoop(vtx_list, flat_threshold):
     n = len(vtx_list)
-    angle_data = []
-    for i, v in enumerate(vtx_list):
-        if i == 0 or i == n - 1:
-            angle = 180.0
-            deviation = abs(angle - 90.0)
-            angle_data.append((i, v, angle, deviation))
-            continue
-        prev_pt = mc.xform(vtx_list[i - 1], q=True, ws=True, t=True)
-        cur_pt  = mc.xform(vtx_list[i],     q=True, ws=True, t=True)
-        next_pt = mc.xform(vtx_list[i + 1], q=True, ws=True, t=True)
-        v1 = [prev_pt[j] - cur_pt[j] for j in range(3)]
-        v2 = [next_pt[j] - cur_pt[j] for j in range(3)]
-        m1 = math.sqrt(sum(x*x for x in v1))
-        m2 = math.sqrt(sum(x*x for x in v2))
-        if m1 == 0 or m2 == 0:
-            angle = 90.0
-        else:
-            cosang = sum(a*b for a,b in zip(v1,v2)) / (m1*m2)
-            angle = math.degrees(math.acos(max(-1.0, min(1.0, cosang))))
-
-        deviation = abs(angle - 90.0)
-        angle_data.append((i, v, angle, deviation))
-    angles = [t[2] for t in angle_data]
-    diffs = [angles[i] - angles[i+1] for i in range(len(angles)-1)]
-    abs_diffs = [abs(d) for d in diffs]
-    if not abs_diffs:
-        return 0
-
-    avg_abs_diff = sum(abs_diffs) / len(abs_diffs)
+    if n < 3:
+        # just the two straight ends (or less): nothing to query
+        return 1 if n == 2 and flat_threshold > 0 else 0
+    angles = _compute_angles(_vtx_positions(vtx_list), closed=False)[0]
+    avg_abs_diff = float(np.abs(np.diff(angles)).mean())
     return 1 if avg_abs_diff < flat_threshold else 0
 
 
@@ -54,26 +210,9 @@ def segmentsAdaptiveOpen(vtx_list, similarity_threshold=5.0, corner_threshold=30
     n = len(vtx_list)
     if n < k:
         return [], [], [], []
-    angle_data = []
-    for i, v in enumerate(vtx_list):
-        if i in (0, n - 1):
-            angle_data.append((i, v, 180.0, 90.0))
-            continue
-        prev_pt = mc.xform(vtx_list[i - 1], q=True, ws=True, t=True)
-        cur_pt  = mc.xform(vtx_list[i],     q=True, ws=True, t=True)
-        next_pt = mc.xform(vtx_list[i + 1], q=True, ws=True, t=True)
-        v1 = [prev_pt[j] - cur_pt[j] for j in range(3)]
-        v2 = [next_pt[j] - cur_pt[j] for j in range(3)]
-        m1 = math.sqrt(sum(x * x for x in v1))
-        m2 = math.sqrt(sum(x * x for x in v2))
-        if m1 == 0 or m2 == 0:
-            angle = 90.0
-        else:
-            cosang = sum(a * b for a, b in zip(v1, v2)) / (m1 * m2)
-            angle = math.degrees(math.acos(max(-1.0, min(1.0, cosang))))
-            
-        deviation = abs(angle - 90.0)
-        angle_data.append((i, v, angle, deviation))
+    pts = _vtx_positions(vtx_list)
+    angles, deviations = _compute_angles(pts, closed=False)
+    angle_data = list(zip(range(n), vtx_list, angles.tolist(), deviations.tolist()))
     deviations = [d for (_, _, _, d) in angle_data if d != 90.0]
     if deviations and (max(deviations) - min(deviations) <= similarity_threshold):
         corner_idxs = [int(i * n / k) for i in range(k)]
@@ -93,7 +232,7 @@ def segmentsAdaptiveOpen(vtx_list, similarity_threshold=5.0, corner_threshold=30
         fb.sort(key=lambda x: x[0])
         corner_idxs = [item[0] for item in fb]
     corner_vertices  = [vtx_list[i] for i in corner_idxs]
-    corner_positions = [mc.xform(v, q=True, ws=True, t=True) for v in corner_vertices]
+    corner_positions = pts[corner_idxs].tolist()
     sharp = [i for (i, v, ang, dev) in angle_data
              if (dev <= corner_threshold and i not in (0, n - 1))]
 
@@ -127,81 +266,69 @@ def segmentsAdaptiveOpen(vtx_list, similarity_threshold=5.0, corner_threshold=30
         seg1 = vtx_list[lengths[0] - 1: lengths[0] + lengths[1] + 1]
         seg2 = vtx_list[lengths[0] + lengths[1] - 1: -1]
         init_segments = [seg1, seg0, seg2]
-    segments_pos = [[mc.xform(vtx, q=True, ws=True, t=True) for vtx in seg]
-                    for seg in init_segments]
+    segments_pos = _segments_positions(init_segments, dict(zip(vtx_list, pts.tolist())))
     return init_segments, segments_pos, corner_vertices, corner_positions
 
 
 def instantQPatchOpen():
-    #autoModeState = mc.checkBox('QPatchAutoMode', q=1 ,v=1)
-    cleanList = ('innerLoop','oldSelLoop')
-    for c in cleanList:
-        if mc.objExists(c):
-            mc.delete(c)
-    selEdge = mc.filterExpand(sm = 32)
-    if selEdge:
-        selShape = mc.ls(selEdge[0], objectsOnly=True)[0]
-        transNode = mc.listRelatives(selShape, parent=True)
-        selGeo = transNode[0]
-        cmd  = 'doMenuComponentSelectionExt("' + selGeo + '", "edge", 0);'  
-        mel.eval(cmd)
-        mc.displaySmoothness(selGeo, divisionsU=0, divisionsV=0, pointsWire=4, pointsShaded=1, polygonObject=1)
-        mc.nurbsToPolygonsPref(polyType=1, format=2, uType=3, uNumber=1, vType=3, vNumber=1)
-        curves = []
-        segments_pos = []
-        checkLoopSize = getEdgeRingGroupList(selEdge)
-        if len(checkLoopSize) == 1:
-            getCircleState, listSelVtx = vtxLoopOrderCheck(selEdge)  
-            flatState = checkFlatLoop(listSelVtx, 5)
-            if getCircleState == 0:
-                if flatState == 0:
-                    getCircleState, listSelVtx = vtxLoopOrderCheck(selEdge)  
-                    segments, segments_pos, corner_verts, corner_pos = segmentsAdaptiveOpen(listSelVtx,similarity_threshold=35.0,corner_threshold=55.0)
-                else:
-                    mc.polySelectConstraint(disable=True)
-                    mc.polySelectConstraint(m=2, w=2, t=0x8000)
-                    selInner = mc.ls(sl=True, fl=True)
-                    mc.select(selEdge, r=True)
-                    mc.polySelectConstraint(m=2, w=1, t=0x8000)
-                    selBorder = mc.ls(sl=True, fl=True)
-                    mc.select(selEdge, r=True)
-                    if len(selInner) > len(selBorder):
-                        mc.polySelectConstraint(pp=5, t=0x8000)
-                        mc.polySelectConstraint(m=0, w=0)
-                        mc.polySelectConstraint(disable=True)
+    with _fast_maya('instantQPatchOpen'):
+        #autoModeState = mc.checkBox('QPatchAutoMode', q=1 ,v=1)
+        cleanList = ('innerLoop','oldSelLoop')
+        for c in cleanList:
+            if mc.objExists(c):
+                mc.delete(c)
+        selEdge = mc.filterExpand(sm = 32)
+        if selEdge:
+            selShape = mc.ls(selEdge[0], objectsOnly=True)[0]
+            transNode = mc.listRelatives(selShape, parent=True)
+            selGeo = transNode[0]
+            cmd  = 'doMenuComponentSelectionExt("' + selGeo + '", "edge", 0);'  
+            mel.eval(cmd)
+            mc.displaySmoothness(selGeo, divisionsU=0, divisionsV=0, pointsWire=4, pointsShaded=1, polygonObject=1)
+            mc.nurbsToPolygonsPref(polyType=1, format=2, uType=3, uNumber=1, vType=3, vNumber=1)
+            curves = []
+            segments_pos = []
+            selMap = _edge_vertex_map(selEdge)
+            checkLoopSize = getEdgeRingGroupList(selEdge, e2v=selMap)
+            if len(checkLoopSize) == 1:
+                getCircleState, listSelVtx = vtxLoopOrderCheck(selEdge, e2v=selMap)[:2]
+                flatState = checkFlatLoop(listSelVtx, 5)
+                if getCircleState == 0:
+                    if flatState == 0:
+                        segments, segments_pos, corner_verts, corner_pos = segmentsAdaptiveOpen(listSelVtx,similarity_threshold=35.0,corner_threshold=55.0)
                     else:
-                        mc.polySelectConstraint(pp=1, m=2, w=1, t=0x8000)
-                        mc.polySelectConstraint(m=0, w=0)
                         mc.polySelectConstraint(disable=True)
-                        selEdge = mc.filterExpand(sm = 32)
-                        getCircleState, listSelVtx = vtxLoopOrderCheck(selEdge)  
-                        seg0 = listSelVtx[0:2]
-                        seg1 = listSelVtx[1:-1]
-                        seg2 = (listSelVtx[-2],listSelVtx[-1])
-                        init_segments = [seg1, seg0, seg2]
-                        segments_pos = [[mc.xform(vtx, q=True, ws=True, t=True) for vtx in seg]
-                                        for seg in init_segments]
-
-                curves = create_segment_curves(segments_pos, degree=1, close_loop=False)
-                if curves:
-                    mc.singleProfileBirailSurface(curves[0],curves[1],curves[2],ch=1, po=1, tm=1, tp1=0)
-                    mc.delete(curves)
-                    newMesh = mc.ls(sl=1)
-                    mc.ConvertSelectionToEdges()
-                    mc.sets(name='oldSelLoop', text='oldSelLoop')
-                    mc.select(newMesh)           
-                    mc.select(selGeo, add=True)
-                    mc.polyUnite(ch=0, mergeUVSets=1, name=selGeo)
-                    newName = mc.ls(selection=True)
-                    mc.polyMergeVertex(distance= 0.001, am=True, ch=0)
-                    mc.rename(newName[0], selGeo)
-                    mc.polyNormal(selGeo,normalMode=2, userNormalMode=0, ch=0)
-                    mc.SetToFaceNormals()
-                    mc.select('oldSelLoop')
-                    cmd  = 'doMenuComponentSelectionExt("' + selGeo  + '", "edge", 0);'  
-                    mel.eval(cmd)
-                    mc.polySelectConstraint(m=2, w=1, t=0x8000)
-                    mc.polySelectConstraint(disable=True)
+                        selInner, selBorder = _split_border_edges(selEdge)
+                        if len(selInner) > len(selBorder):
+                            mc.polySelectConstraint(pp=5, m=2, w=1, t=0x8000)
+                            mc.polySelectConstraint(m=0, w=0)
+                            mc.polySelectConstraint(disable=True)
+                        else:
+                            mc.polySelectConstraint(pp=1, m=2, w=1, t=0x8000)
+                            mc.polySelectConstraint(m=0, w=0)
+                            mc.polySelectConstraint(disable=True)
+                            selEdge = mc.filterExpand(sm = 32)
+                            getCircleState, listSelVtx = vtxLoopOrderCheck(selEdge)[:2]
+                            seg0 = listSelVtx[0:2]
+                            seg1 = listSelVtx[1:-1]
+                            seg2 = (listSelVtx[-2],listSelVtx[-1])
+                            init_segments = [seg1, seg0, seg2]
+                            segments_pos = _segments_positions(init_segments)
+
+                    curves = create_segment_curves(segments_pos, degree=1, close_loop=False)
+                    if curves:
+                        mc.singleProfileBirailSurface(curves[0],curves[1],curves[2],ch=1, po=1, tm=1, tp1=0)
+                        mc.delete(curves)
+                        newMesh = mc.ls(sl=1)
+                        mc.ConvertSelectionToEdges()
+                        mc.sets(name='oldSelLoop', text='oldSelLoop')
+                        mc.select(newMesh)           
+                        _unite_patch(selGeo, selGeo)
+                        mc.select('oldSelLoop')
+                        cmd  = 'doMenuComponentSelectionExt("' + selGeo  + '", "edge", 0);'  
+                        mel.eval(cmd)
+                        mc.polySelectConstraint(m=2, w=1, t=0x8000)
+                        mc.polySelectConstraint(disable=True)
 
 
     
@@ -210,13 +337,33 @@ def segmentsPositions(vtx_list, initial_verts):
     len0 = len(initial_verts)
     if n < 4 or len0 < 1:
         return [], []
-    init_set = set(initial_verts)
+    ids = [int(_COMP_RE.search(v).group(1)) for v in vtx_list]
+    init_set = frozenset(int(_COMP_RE.search(v).group(1)) for v in initial_verts)
+    # slide a cyclic window of len0 verts, keeping counts of the distinct
+    # ids inside it that are / are not initial verts
+    window = Counter(ids[j % n] for j in range(len0))
+    inside = sum(1 for k in window if k in init_set)
+    outside = len(window) - inside
     start_idx = None
     for s in range(n):
-        block = [vtx_list[(s + j) % n] for j in range(len0)]
-        if set(block) == init_set:
+        if inside == len(init_set) and outside == 0:
             start_idx = s
             break
+        drop = ids[s]
+        window[drop] -= 1
+        if not window[drop]:
+            del window[drop]
+            if drop in init_set:
+                inside -= 1
+            else:
+                outside -= 1
+        add = ids[(s + len0) % n]
+        if not window[add]:
+            if add in init_set:
+                inside += 1
+            else:
+                outside += 1
+        window[add] += 1
     if start_idx is None:
         return [], []
     rotated = [vtx_list[(start_idx + i) % n] for i in range(n)]
@@ -237,83 +384,78 @@ def segmentsPositions(vtx_list, initial_verts):
     seg3_body = rotated[last2 + 1:]
     seg3 = [rotated[last2]] + seg3_body + [rotated[0]]
     segments = [seg0, seg1, seg2, seg3]
-    segments_pos = [
-        [mc.xform(v, q=True, ws=True, t=True) for v in seg]
-        for seg in segments
-    ]
+    segments_pos = _segments_positions(segments)
     return segments, segments_pos
 
 
-def getEdgeRingGroupList(selEdges):
+def _edge_vertex_map(selEdges):
+    e2v = {}
+    for nums in _parse_polyinfo(mc.polyInfo(selEdges, ev=True)):
+        if len(nums) >= 3:
+            e2v[nums[0]] = nums[1:3]
+    return e2v
+
+def getEdgeRingGroupList(selEdges, e2v=None):
     if not selEdges:
         return []
     transform = selEdges[0].split('.')[0]
-    e2v = {}
-    v2e = defaultdict(set)
-    infos = mc.polyInfo(selEdges, ev=True) or []
-    for info in infos:
-        nums = list(map(int, re.findall(r"\d+", info)))
-        if len(nums) < 3:
-            continue
-        edge_idx, v1, v2 = nums[0], nums[1], nums[2]
-        e2v[edge_idx] = (v1, v2)
-        v2e[v1].add(edge_idx)
-        v2e[v2].add(edge_idx)
+    if e2v is None:
+        e2v = _edge_vertex_map(selEdges)
+    if not e2v:
+        return []
+    # edge -> (v0, v1) and vertex -> edges (CSR form: offsets + edges sorted
+    # by vertex), all on dense selection-local ids so every table is sized by
+    # the selection rather than by the highest edge/vertex id of the mesh
+    eids = np.fromiter(e2v.keys(), dtype=np.int64, count=len(e2v))
+    ends = np.unique(np.array(list(e2v.values()), dtype=np.int64), return_inverse=True)[1].reshape(-1, 2)
+    vids = ends.ravel()
+    v2e_idx = np.repeat(np.arange(len(eids)), 2)[np.argsort(vids, kind='stable')]
+    v2e_off = np.zeros(int(vids.max()) + 2, np.int64)
+    np.cumsum(np.bincount(vids), out=v2e_off[1:])
+    ev0, ev1 = ends[:, 0].tolist(), ends[:, 1].tolist()
+    v2e_idx, v2e_off = v2e_idx.tolist(), v2e_off.tolist()
+    used = [False] * len(eids)
     groups = []
-    for start in list(e2v.keys()):
-        verts = e2v.pop(start, None)
-        if verts is None:
+    for start in range(len(eids)):
+        if used[start]:
             continue
-        v1, v2 = verts
-        v2e[v1].discard(start)
-        v2e[v2].discard(start)
+        used[start] = True
         ring = [start]
-        for initial_vert, prepend in ((v2, False), (v1, True)):
-            current = initial_vert
+        for current, prepend in ((ev1[start], False), (ev0[start], True)):
             while True:
-                adj = v2e.get(current)
-                if not adj or len(adj) != 1:
-                    break
-                nxt = adj.pop()
-                verts = e2v.pop(nxt, None)
-                if verts is None:
+                adj = [e for e in v2e_idx[v2e_off[current]:v2e_off[current + 1]] if not used[e]]
+                if len(adj) != 1:
                     break
-                a, b = verts
-                v2e[a].discard(nxt)
-                v2e[b].discard(nxt)
+                nxt = adj[0]
+                used[nxt] = True
                 if prepend:
                     ring.insert(0, nxt)
-                    current = b if a == current else a
                 else:
                     ring.append(nxt)
-                    current = b if a == current else a
+                current = ev1[nxt] if ev0[nxt] == current else ev0[nxt]
 
         groups.append(ring)
+    eids = eids.tolist()
     result = []
     for ring in groups:
-        result.append([f"{transform}.e[{e}]" for e in ring])
+        result.append([f"{transform}.e[{eids[e]}]" for e in ring])
     return result
     
-def vtxLoopOrderCheck(selEdges):
+def vtxLoopOrderCheck(selEdges, e2v=None):
     shapeNode = mc.listRelatives(selEdges[0], fullPath=True , parent=True )
     transformNode = mc.listRelatives(shapeNode[0], fullPath=True , parent=True )
-    edgeNumberList = []
-    for a in selEdges:
-        checkNumber = ((a.split('.')[1]).split('\n')[0]).split(' ')
-        for c in checkNumber:
-            findNumber = ''.join([n for n in c.split('|')[-1] if n.isdigit()])
-            if findNumber:
-                edgeNumberList.append(findNumber)
-    getNumber = []
-    for s in selEdges:
-        evlist = mc.polyInfo(s,ev=True)
-        checkNumber = ((evlist[0].split(':')[1]).split('\n')[0]).split(' ')
-        for c in checkNumber:
-            findNumber = ''.join([n for n in c.split('|')[-1] if n.isdigit()])
-            if findNumber:
-                getNumber.append(findNumber)
-    dup = set([x for x in getNumber if getNumber.count(x) > 1])
-    getHeadTail = list(set(getNumber) - dup)
+    edgeIds = [int(_COMP_RE.search(e).group(1)) for e in selEdges]
+    edgeNumberList = set(edgeIds)
+    if e2v is None:
+        e2v = _edge_vertex_map(selEdges)
+    getNumber = [v for e in edgeIds for v in e2v.get(e, ())]
+    v2e = {}
+    vtxComps = [transformNode[0] + '.vtx[' + str(v) + ']' for v in dict.fromkeys(getNumber)]
+    for nums in _parse_polyinfo(mc.polyInfo(vtxComps, ve=True)):
+        if nums:
+            v2e[nums[0]] = nums[1:]
+    dup = {x for x, c in Counter(getNumber).items() if c > 1}
+    getHeadTail = sorted(set(getNumber) - dup)
     checkCircleState = 0
     if not getHeadTail:
         checkCircleState = 1
@@ -322,29 +464,13 @@ def vtxLoopOrderCheck(selEdges):
     vftOrder.append(getHeadTail[0])
     count = 0
     while len(dup)> 0 and count < 1000:
-        checkVtx = transformNode[0]+'.vtx['+ vftOrder[-1] + ']'
-        velist = mc.polyInfo(checkVtx,ve=True)
-        getNumber = []
-        checkNumber = ((velist[0].split(':')[1]).split('\n')[0]).split(' ')
-        for c in checkNumber:
-            findNumber = ''.join([n for n in c.split('|')[-1] if n.isdigit()])
-            if findNumber:
-                getNumber.append(findNumber)
         findNextEdge = []
-        for g in getNumber:
+        for g in v2e.get(vftOrder[-1], ()):
             if g in edgeNumberList:
                 findNextEdge = g
         edgeNumberList.remove(findNextEdge)
-        checkVtx = transformNode[0]+'.e['+ findNextEdge + ']'
-        findVtx = mc.polyInfo(checkVtx,ev=True)
-        getNumber = []
-        checkNumber = ((findVtx[0].split(':')[1]).split('\n')[0]).split(' ')
-        for c in checkNumber:
-            findNumber = ''.join([n for n in c.split('|')[-1] if n.isdigit()])
-            if findNumber:
-                getNumber.append(findNumber)
         gotNextVtx = []
-        for g in getNumber:
+        for g in e2v[findNextEdge]:
             if g in dup:
                 gotNextVtx = g
         dup.remove(gotNextVtx)
@@ -359,9 +485,9 @@ def vtxLoopOrderCheck(selEdges):
             vftOrder = vftOrder[0:-1]
     finalList = []
     for v in vftOrder:
-        finalList.append(transformNode[0]+'.vtx['+ v + ']' )
+        finalList.append(transformNode[0]+'.vtx['+ str(v) + ']' )
 
-    return checkCircleState, finalList
+    return checkCircleState, finalList, e2v, v2e
 
 
 def create_segment_curves(segments_pos, degree=1, close_loop=False, name_prefix="segmentCurve"):
@@ -375,51 +501,41 @@ def create_segment_curves(segments_pos, degree=1, close_loop=False, name_prefix=
         curve_names.append(curve)
     return curve_names
 
-def get_shortest_edge(edge_list):
-    shortest_edge = None
-    shortest_length = float('inf')
+def get_shortest_edge(edge_list, e2v=None, positions=None):
+    # e2v / positions (vertex id -> position) can be passed in when the
+    # caller already has them, skipping both Maya queries
+    if not edge_list:
+        return None, float('inf')
+    if e2v is None:
+        e2v = _edge_vertex_map(edge_list)
+    edges, v0_idx, v1_idx = [], [], []
     for e in edge_list:
-        verts = mc.polyListComponentConversion(e, fromEdge=True, toVertex=True)
-        verts = mc.ls(verts, flatten=True)
-        if len(verts) != 2:
+        verts = e2v.get(int(_COMP_RE.search(e).group(1)))
+        if verts is None:
             continue
-        p1 = mc.xform(verts[0], q=True, ws=True, t=True)
-        p2 = mc.xform(verts[1], q=True, ws=True, t=True)
-        dx, dy, dz = (p2[0]-p1[0], p2[1]-p1[1], p2[2]-p1[2])
-        length = math.sqrt(dx*dx + dy*dy + dz*dz)
-        
-        if length < shortest_length:
-            shortest_length = length
-            shortest_edge = e
-    
-    return shortest_edge, shortest_length
+        edges.append(e)
+        v0_idx.append(verts[0])
+        v1_idx.append(verts[1])
+    if not edges:
+        return None, float('inf')
+    P = _points_by_id(edges[0], v0_idx + v1_idx) if positions is None else positions
+    lens = np.linalg.norm(np.array([P[v] for v in v0_idx]) - np.array([P[v] for v in v1_idx]), axis=1)
+    i = int(np.argmin(lens))
+    return edges[i], float(lens[i])
 
 
 def segmentsPositions_adaptive(vtx_list,
                                         similarity_threshold=5.0,
-                                        corner_threshold=30.0):
+                                        corner_threshold=30.0,
+                                        pts=None):
+    # pts: positions of vtx_list when the caller already queried them
     n = len(vtx_list)
     if n < 4:
         return [], [], [], []
-    angle_data = []
-    for i, v in enumerate(vtx_list):
-        prev_pt = mc.xform(vtx_list[(i-1) % n], q=True, ws=True, t=True)
-        cur_pt  = mc.xform(vtx_list[i],          q=True, ws=True, t=True)
-        next_pt = mc.xform(vtx_list[(i+1) % n],  q=True, ws=True, t=True)
-
-        v1 = [prev_pt[j] - cur_pt[j] for j in range(3)]
-        v2 = [next_pt[j] - cur_pt[j] for j in range(3)]
-        m1 = math.sqrt(sum(x*x for x in v1))
-        m2 = math.sqrt(sum(x*x for x in v2))
-
-        if m1 == 0 or m2 == 0:
-            angle = 90.0
-        else:
-            cosang = sum(a*b for a, b in zip(v1, v2)) / (m1 * m2)
-            cosang = max(-1.0, min(1.0, cosang))
-            angle = math.degrees(math.acos(cosang))
-        deviation = abs(angle - 90.0)
-        angle_data.append((i, v, angle, deviation))
+    if pts is None:
+        pts = _vtx_positions(vtx_list)
+    angles, deviations = _compute_angles(pts, closed=True)
+    angle_data = list(zip(range(n), vtx_list, angles.tolist(), deviations.tolist()))
     deviations = [d for (_, _, _, d) in angle_data]
     if max(deviations) - min(deviations) <= similarity_threshold:
         corner_idxs = [int(i * n / 4) for i in range(4)]
@@ -438,7 +554,7 @@ def segmentsPositions_adaptive(vtx_list,
         corner_idxs = [item[0] for item in fallback]
 
     corner_vertices  = [vtx_list[i] for i in corner_idxs]
-    corner_positions = [mc.xform(v, q=True, ws=True, t=True) for v in corner_vertices]
+    corner_positions = pts[corner_idxs].tolist()
     init_segments = []
     for k in range(4):
         start = corner_idxs[k]
@@ -471,111 +587,104 @@ def segmentsPositions_adaptive(vtx_list,
     seg3_body = rotated[last2 + 1:]
     seg3 = [rotated[last2]] + seg3_body + [rotated[0]]
     segments = [seg0, seg1, seg2, seg3]
-    segments_pos = [
-        [mc.xform(v, q=True, ws=True, t=True) for v in seg]
-        for seg in segments
-    ]
+    segments_pos = _segments_positions(segments, dict(zip(vtx_list, pts.tolist())))
     return segments, segments_pos, corner_vertices, corner_positions
 
 
 def instantQPatch():
-    cleanList = ('innerLoop','oldSelLoop')
-    for c in cleanList:
-        if mc.objExists(c):
-            mc.delete(c)
-    selEdge = mc.filterExpand(sm = 32)
-    if selEdge:
-        selGeo = mc.ls(hl=1)
-        mc.displaySmoothness(selGeo, divisionsU=0, divisionsV=0, pointsWire=4, pointsShaded=1, polygonObject=1)
-        mc.nurbsToPolygonsPref(polyType=1, format=2, uType=3, uNumber=1, vType=3, vNumber=1)
-        curves = []
-        segments_pos = []
-        checkLoopSize = getEdgeRingGroupList(selEdge)
-        if len(checkLoopSize) == 1:
-            getCircleState, listSelVtx = vtxLoopOrderCheck(selEdge)  
-            if getCircleState == 0:
-                fullPossibleLoop = mc.polySelectSp(selEdge[0], loop=1, q=1)
-                fullPossibleLoop = mc.ls(fullPossibleLoop,fl=1)
-                getCircleState, listVtx = vtxLoopOrderCheck(fullPossibleLoop)  
-                if getCircleState == 1:
-                    amount = len(fullPossibleLoop)
-                    checkSelAmount = len(selEdge)
-                    maxPossible = int((amount / 2) - 1)
-                    if checkSelAmount > maxPossible:
-                        mc.select(listSelVtx[0:maxPossible]) 
-                        mc.ConvertSelectionToContainedEdges()
-                        selEdge = mc.filterExpand(sm = 32) 
+    with _fast_maya('instantQPatch'):
+        cleanList = ('innerLoop','oldSelLoop')
+        for c in cleanList:
+            if mc.objExists(c):
+                mc.delete(c)
+        selEdge = mc.filterExpand(sm = 32)
+        if selEdge:
+            selGeo = mc.ls(hl=1)
+            mc.displaySmoothness(selGeo, divisionsU=0, divisionsV=0, pointsWire=4, pointsShaded=1, polygonObject=1)
+            mc.nurbsToPolygonsPref(polyType=1, format=2, uType=3, uNumber=1, vType=3, vNumber=1)
+            curves = []
+            segments_pos = []
+            selMap = _edge_vertex_map(selEdge)
+            checkLoopSize = getEdgeRingGroupList(selEdge, e2v=selMap)
+            if len(checkLoopSize) == 1:
+                getCircleState, listSelVtx = vtxLoopOrderCheck(selEdge, e2v=selMap)[:2]
+                if getCircleState == 0:
+                    fullPossibleLoop = mc.polySelectSp(selEdge[0], loop=1, q=1)
+                    fullPossibleLoop = mc.ls(fullPossibleLoop,fl=1)
+                    getCircleState, fullLoopVtx = vtxLoopOrderCheck(fullPossibleLoop)[:2]
+                    if getCircleState == 1:
+                        amount = len(fullPossibleLoop)
+                        checkSelAmount = len(selEdge)
+                        maxPossible = int((amount / 2) - 1)
+                        if checkSelAmount > maxPossible:
+                            mc.select(listSelVtx[0:maxPossible]) 
+                            mc.ConvertSelectionToContainedEdges()
+                            selEdge = mc.filterExpand(sm = 32) 
+                        if amount % 2 == 1:
+                            mc.sets(name='oldSelLoop', text='oldSelLoop')
+                            mc.select(fullPossibleLoop)
+                            mc.polyExtrudeEdge(constructionHistory=0, keepFacesTogether=1, divisions=1, twist=0, taper=1, offset=0.05, thickness=0, smoothingAngle=30)
+                            mc.sets(name='innerLoop', text='innerLoop')
+                            inner = _selected_edges()
+                            getCircleState, listVtx, innerE2v, _ = vtxLoopOrderCheck(inner)
+                            loopPts = _vtx_positions(listVtx)
+                            vtxPrefix = listVtx[0].split('.')[0]
+                            short_edge, short_len = get_shortest_edge(inner, innerE2v, _positions_by_id(listVtx, loopPts))
+                            verts = [vtxPrefix + '.vtx[' + str(v) + ']' for v in innerE2v[int(_COMP_RE.search(short_edge).group(1))]]
+                            segments, segments_pos, corner_verts, corner_pos = segmentsPositions_adaptive(listVtx,similarity_threshold=5.0,corner_threshold=30.0,pts=loopPts)
+                            matches = set(verts) & set(corner_verts)
+                            if matches:
+                                pointB = set(verts) - set(matches)
+                                target_pos = mc.xform(matches, q=True, t=True, ws=True)
+                                mc.xform(pointB, t=target_pos, ws=True)
+                            mc.polyCollapseEdge(short_edge,ch=0)
+                            oldSelLoopList = mc.sets('oldSelLoop', query=True)
+                            toface = mc.polyListComponentConversion(oldSelLoopList,fromEdge=True, toFace=True)
+                            toEdge = mc.polyListComponentConversion(toface, fromFace=True, toEdge=True)
+                            getBorderEdges = mc.ls(toEdge,fl=1)
+                            inner = mc.sets('innerLoop', query=True)
+                            inner = mc.ls(inner,fl=1)
+                            newSel = list(set(inner) & set(getBorderEdges))
+                            mc.delete('innerLoop','oldSelLoop')                   
+                            getCircleState, initialVerts = vtxLoopOrderCheck(newSel)[:2]
+                            getCircleState, listVtx = vtxLoopOrderCheck(inner)[:2]
+                            segments, segments_pos = segmentsPositions(listVtx, initialVerts)
+                        else:
+                            initialVerts = listSelVtx
+                            if checkSelAmount > maxPossible:
+                                initialVerts = vtxLoopOrderCheck(selEdge)[1]
+                            segments, segments_pos = segmentsPositions(fullLoopVtx, initialVerts)
+                else:
+                    amount = len(selEdge)
                     if amount % 2 == 1:
-                        mc.sets(name='oldSelLoop', text='oldSelLoop')
-                        short_edge, short_len = get_shortest_edge(fullPossibleLoop)
-                        mc.select(fullPossibleLoop)
-                        mc.polyExtrudeEdge(constructionHistory=0, keepFacesTogether=1, divisions=1, twist=0, taper=1, offset=0.05, thickness=0, smoothingAngle=30)
+                        short_edge, short_len = get_shortest_edge(selEdge, selMap)
+                        mc.polyExtrudeEdge(constructionHistory=0, keepFacesTogether=1, divisions=1, twist=0, taper=1, offset=short_len/2, thickness=0, smoothingAngle=30)
                         mc.sets(name='innerLoop', text='innerLoop')
-                        inner = mc.ls(selection=True, flatten=True) or []
-                        getCircleState, listVtx = vtxLoopOrderCheck(inner)  
-                        short_edge, short_len = get_shortest_edge(inner)
-                        edge_comp = short_edge if short_edge.startswith("|") else "|" + short_edge
-                        verts = mc.polyListComponentConversion(edge_comp, fromEdge=True, toVertex=True)
-                        verts = mc.ls(verts, l=1,fl=1) or []  
-                        segments, segments_pos, corner_verts, corner_pos = segmentsPositions_adaptive(listVtx,similarity_threshold=5.0,corner_threshold=30.0)
+                        inner = _selected_edges()
+                        getCircleState, listVtx, innerE2v, _ = vtxLoopOrderCheck(inner)
+                        loopPts = _vtx_positions(listVtx)
+                        segments, segments_pos, corner_verts, corner_pos = segmentsPositions_adaptive(listVtx,similarity_threshold=5.0,corner_threshold=30.0,pts=loopPts)
+                        vtxPrefix = listVtx[0].split('.')[0]
+                        short_edge, short_len = get_shortest_edge(inner, innerE2v, _positions_by_id(listVtx, loopPts))
+                        verts = [vtxPrefix + '.vtx[' + str(v) + ']' for v in innerE2v[int(_COMP_RE.search(short_edge).group(1))]]
                         matches = set(verts) & set(corner_verts)
                         if matches:
                             pointB = set(verts) - set(matches)
-                            target_pos = mc.xform(matches, q=True, t=True, ws=True)
-                            mc.xform(pointB, t=target_pos, ws=True)
+                            if pointB:
+                                target_pos = mc.xform(matches, q=True, t=True, ws=True)
+                                mc.xform(pointB, t=target_pos, ws=True)
                         mc.polyCollapseEdge(short_edge,ch=0)
-                        oldSelLoopList = mc.sets('oldSelLoop', query=True)
-                        toface = mc.polyListComponentConversion(oldSelLoopList,fromEdge=True, toFace=True)
-                        toEdge = mc.polyListComponentConversion(toface, fromFace=True, toEdge=True)
-                        getBorderEdges = mc.ls(toEdge,fl=1)
-                        inner = mc.sets('innerLoop', query=True)
-                        inner = mc.ls(inner,fl=1)
-                        newSel = list(set(inner) & set(getBorderEdges))
-                        mc.delete('innerLoop','oldSelLoop')                   
-                        getCircleState, initialVerts = vtxLoopOrderCheck(newSel) 
-                        getCircleState, listVtx = vtxLoopOrderCheck(inner)   
-                        segments, segments_pos = segmentsPositions(listVtx, initialVerts)
-                    else:
-                        getCircleState, initialVerts = vtxLoopOrderCheck(selEdge) 
-                        getCircleState, listVtx = vtxLoopOrderCheck(fullPossibleLoop)  
-                        segments, segments_pos = segmentsPositions(listVtx, initialVerts)
-            else:
-                amount = len(selEdge)
-                if amount % 2 == 1:
-                    short_edge, short_len = get_shortest_edge(selEdge)
-                    mc.polyExtrudeEdge(constructionHistory=0, keepFacesTogether=1, divisions=1, twist=0, taper=1, offset=short_len/2, thickness=0, smoothingAngle=30)
-                    mc.sets(name='innerLoop', text='innerLoop')
-                    inner = mc.ls(selection=True, flatten=True) or []
-                    getCircleState, listVtx = vtxLoopOrderCheck(inner)  
-                    segments, segments_pos, corner_verts, corner_pos = segmentsPositions_adaptive(listVtx,similarity_threshold=5.0,corner_threshold=30.0)
-                    short_edge, short_len = get_shortest_edge(inner)
-                    #edge_comp = short_edge if short_edge.startswith("|") else "|" + short_edge
-                    verts = mc.polyListComponentConversion(short_edge, fromEdge=True, toVertex=True)
-                    verts = mc.ls(verts, l=1,fl=1) or []  
-                    matches = set(verts) & set(corner_verts)
-                    if matches:
-                        pointB = set(verts) - set(matches)
-                        if pointB:
-                            target_pos = mc.xform(matches, q=True, t=True, ws=True)
-                            mc.xform(pointB, t=target_pos, ws=True)
-                    mc.polyCollapseEdge(short_edge,ch=0)
-                    selEdge = mc.sets('innerLoop', query=True)
-                    selEdge = mc.ls(selEdge,fl=1)
-                    mc.delete('innerLoop')
-                getCircleState, listVtx = vtxLoopOrderCheck(selEdge)  
-                segments, segments_pos, corner_verts, corner_pos = segmentsPositions_adaptive(listVtx,similarity_threshold=35.0,corner_threshold=55.0)
-        curves = create_segment_curves(segments_pos, degree=1, close_loop=False)
-        if curves:
-            mc.boundary(curves[0], curves[1], curves[2], curves[3],ch=0,ep=0,po=1,order=0)
-            mc.delete(curves)
-            mc.select(selGeo, add=True)
-            mc.polyUnite(ch=0, mergeUVSets=1, name=selGeo[0])
-            newName = mc.ls(selection=True)
-            mc.polyMergeVertex(distance= 0.001, am=True, ch=0)
-            mc.rename(newName[0], selGeo[0])
-            mc.polyNormal(selGeo[0],normalMode=2, userNormalMode=0, ch=0)
-            mc.SetToFaceNormals()
-            mc.select(selGeo[0], replace=True)
+                        selEdge = mc.sets('innerLoop', query=True)
+                        selEdge = mc.ls(selEdge,fl=1)
+                        mc.delete('innerLoop')
+                        listSelVtx = vtxLoopOrderCheck(selEdge)[1]
+                    segments, segments_pos, corner_verts, corner_pos = segmentsPositions_adaptive(listSelVtx,similarity_threshold=35.0,corner_threshold=55.0)
+            curves = create_segment_curves(segments_pos, degree=1, close_loop=False)
+            if curves:
+                mc.boundary(curves[0], curves[1], curves[2], curves[3],ch=0,ep=0,po=1,order=0)
+                mc.delete(curves)
+                _unite_patch(selGeo, selGeo[0])
+                mc.select(selGeo[0], replace=True)
 
 def instantQPatchUI():
     cleanList = ('innerLoop','oldSelLoop')
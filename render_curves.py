@@ -4,8 +4,14 @@
 # - Set Sample Rate and Curve Width (defaults 50 / 0.3)
 # Works on typical MtoA attribute names; tries fallbacks where needed.
 
-from maya import cmds
+import contextlib
+import re
+import weakref
+
+from maya import cmds, mel
 from maya import OpenMayaUI as omui
+import maya.api.OpenMaya as om2
+import numpy as np
 
 # PySide2 ships with Maya 2017+
 from shiboken2 import wrapInstance
@@ -13,92 +19,104 @@ from PySide2 import QtWidgets, QtCore
 
 WINDOW_TITLE = "Arnold Curves Tool"
 
+# Weak reference to the last opened dialog (kept across re-runs of this script)
+_LAST_DLG = globals().get("_LAST_DLG", [None])
+
+# Common curve suffixes (_crv, _curve, _shape + optional digits) and trailing digits
+_RE_SUFFIX = re.compile(r'_(crv|curve|shape)(\d*)$', re.IGNORECASE)
+_RE_TRAILING_DIGITS = re.compile(r'_?\d+$')
+
 # ---------- core helpers ----------
 
 def get_maya_main_window():
     ptr = omui.MQtUtil.mainWindow()
     return wrapInstance(int(ptr), QtWidgets.QWidget)
 
+@contextlib.contextmanager
+def _fast_batch():
+    """Suspend viewport refresh during bulk edits."""
+    cmds.refresh(suspend=True)
+    try:
+        yield
+    finally:
+        cmds.refresh(suspend=False)
+        cmds.refresh()
+
 def get_base_name(name):
     """Get base name by removing trailing digits and common suffixes like _crv."""
-    import re
-    # Remove common curve suffixes first
-    name = re.sub(r'_(crv|curve|shape)(\d*)$', '', name, flags=re.IGNORECASE)
-    # Remove trailing digits
-    name = re.sub(r'_?\d+$', '', name)
-    return name
+    # Remove common curve suffixes first, then trailing digits
+    return _RE_TRAILING_DIGITS.sub('', _RE_SUFFIX.sub('', name))
+
+def get_parent_path(path):
+    """Return the parent's long DAG path of a long DAG path, or None at world level."""
+    return path.rsplit('|', 1)[0] or None
 
 def list_curve_shapes():
     """Return unique NURBS curve shapes (non-intermediate) as long names."""
-    shapes = cmds.ls(type="nurbsCurve", long=True) or []
-    out = []
-    for s in shapes:
-        try:
-            if cmds.attributeQuery("intermediateObject", node=s, exists=True):
-                if cmds.getAttr(s + ".intermediateObject"):
-                    continue
-        except Exception:
-            pass
-        out.append(s)
-    # unique while preserving order
-    seen = set()
-    uniq = []
-    for s in out:
-        if s not in seen:
-            uniq.append(s)
-            seen.add(s)
-    return uniq
-
-def ensure_curve_shader(shader_name="curve_shader"):
+    # noIntermediate filters inside Maya; dict.fromkeys dedupes in order
+    return list(dict.fromkeys(cmds.ls(type="nurbsCurve", long=True, noIntermediate=True) or []))
+
+def ensure_curve_shader(shader_name="curve_shader", shader_type="aiStandardSurface"):
     """
     Ensure a shader node exists for the Curve Shader slot.
-    Uses aiStandardSurface for curves.
+    Uses aiStandardSurface for curves by default (e.g. pass "aiStandardHair").
     Returns the shader node name.
     """
     if not cmds.objExists(shader_name):
-        shader = cmds.shadingNode("aiStandardSurface", asShader=True, name=shader_name)
+        shader = cmds.shadingNode(shader_type, asShader=True, name=shader_name)
     else:
         shader = shader_name
     return shader
 
-def connect_shader_to_curve_slot(curve_shapes, shader):
+# Resolved attribute variant per (node type, variants); MtoA doesn't change mid-session
+_ATTR_CACHE = {}
+
+def _resolve(node, variants):
+    """Return the first attribute name from variants that exists on node, or None."""
+    key = (cmds.nodeType(node), tuple(variants))
+    attr = _ATTR_CACHE.get(key)
+    if attr is None:
+        for a in variants:
+            if cmds.attributeQuery(a, node=node, exists=True):
+                # only hits are cached, so loading MtoA later is still picked up
+                attr = _ATTR_CACHE[key] = a
+                break
+    return attr
+
+def connect_shader_to_curve_slot(curve_shapes, shader, connect_mode="outColor"):
     """
-    Connect shader.message -> curveShape.aiCurveShader (or variants).
-    This is NOT a shadingGroup assignment; it's a message connection used by Arnold.
+    Connect shader.outColor (or shader.message with connect_mode="message")
+    -> curveShape.aiCurveShader (or variants).
+    This is NOT a shadingGroup assignment; it's a direct connection used by Arnold.
     """
     if not curve_shapes:
         return 0
 
     slot_variants = ["aiCurveShader", "aiHairShader", "aiCurveMat", "aiCurveMaterial"]
 
-    connected = 0
-    for shape in curve_shapes:
-        # find a valid slot attribute on this shape
-        slot_attr = None
-        for a in slot_variants:
-            if cmds.attributeQuery(a, node=shape, exists=True):
-                slot_attr = f"{shape}.{a}"
-                break
-        if not slot_attr:
-            continue
+    # all curve shapes share the same MtoA attributes; probe the first one only
+    slot_name = _resolve(curve_shapes[0], slot_variants)
+    if not slot_name:
+        return 0
 
-        # break existing input connections
-        try:
-            incoming = cmds.listConnections(slot_attr, plugs=True, s=True, d=False) or []
-            for src in incoming:
-                try:
-                    cmds.disconnectAttr(src, slot_attr)
-                except Exception:
-                    pass
-        except Exception:
-            pass
+    src_attr = f"{shader}.message" if connect_mode == "message" else f"{shader}.outColor"
 
-        # connect shader.outColor -> slot
-        try:
-            cmds.connectAttr(f"{shader}.outColor", slot_attr, f=True)
-            connected += 1
-        except Exception:
-            pass
+    connected = 0
+    # one undo step for all connect edits
+    cmds.undoInfo(openChunk=True, chunkName="Connect Curve Shader")
+    try:
+        for shape in curve_shapes:
+            slot_attr = f"{shape}.{slot_name}"
+
+            # connect shader.outColor / shader.message -> slot
+            # (f=True replaces any existing input connection)
+            try:
+                cmds.connectAttr(src_attr, slot_attr, f=True)
+                connected += 1
+            except Exception:
+                pass
+    finally:
+        cmds.undoInfo(closeChunk=True)
     return connected
 
 def safe_set_attr(node, attr, value):
@@ -127,19 +145,49 @@ def set_curve_render_attrs(curve_shapes, render_curve, sample_rate, curve_width)
     sample_variants = ["aiSampleRate", "aiCurveSampleRate", "aiCurveSamples"]
     width_variants  = ["aiCurveWidth", "aiWidth", "aiHairWidth"]
 
+    if not curve_shapes:
+        return
+
+    # Resolve each attribute once on the first shape, then set it on all
+    first = curve_shapes[0]
+    values = [
+        (_resolve(first, render_variants), int(bool(render_curve))),  # Render Curve toggle
+        (_resolve(first, sample_variants), int(sample_rate)),         # Sample Rate
+        (_resolve(first, width_variants), float(curve_width)),        # Curve Width
+    ]
+    values = [v for v in values if v[0]]
+
+    # Probe the plugs through the API (read-only), then write them all with one
+    # MEL batch so the edits stay undoable without a Python setAttr per plug
+    sel = om2.MSelectionList()
+    names = []
     for s in curve_shapes:
-        # Render Curve toggle
-        for a in render_variants:
-            if safe_set_attr(s, a, bool(render_curve)):
-                break
-        # Sample Rate
-        for a in sample_variants:
-            if safe_set_attr(s, a, int(sample_rate)):
-                break
-        # Curve Width
-        for a in width_variants:
-            if safe_set_attr(s, a, float(curve_width)):
-                break
+        try:
+            sel.add(s)
+            names.append(s)
+        except RuntimeError:
+            pass
+    lines = []
+    for i, shape in enumerate(names):
+        fn = om2.MFnDependencyNode(sel.getDependNode(i))
+        for attr, value in values:
+            try:
+                plug = fn.findPlug(attr, False)
+            except RuntimeError:
+                continue
+            # locked or driven plugs would make setAttr error and stop the batch
+            if plug.isLocked or plug.isDestination:
+                continue
+            lines.append(f'setAttr "{shape}.{attr}" {value};')
+    if not lines:
+        return
+
+    # one undo step for all attribute edits
+    cmds.undoInfo(openChunk=True, chunkName="Set Curve Render Attrs")
+    try:
+        mel.eval("\n".join(lines))
+    finally:
+        cmds.undoInfo(closeChunk=True)
 
 # ---------- UI ----------
 
@@ -204,22 +252,76 @@ class ArnoldCurvesTool(QtWidgets.QDialog):
         root.addLayout(row)
         root.addWidget(self.status)
 
+        # Cached curve list, dropped whenever curves are added/removed/renamed/reparented
+        # (which also resets the last-apply key below)
+        self._curves_cache = None
+        self._last_apply_key = None
+        self._last_apply_undo = None
+        self._callbacks = [
+            om2.MDGMessage.addNodeAddedCallback(self._invalidate_cache, "nurbsCurve"),
+            om2.MDGMessage.addNodeRemovedCallback(self._invalidate_cache, "nurbsCurve"),
+            om2.MNodeMessage.addNameChangedCallback(om2.MObject.kNullObj, self._invalidate_cache),
+            om2.MDagMessage.addParentAddedCallback(self._invalidate_cache),
+            om2.MSceneMessage.addCallback(om2.MSceneMessage.kAfterOpen, self._invalidate_cache),
+            om2.MSceneMessage.addCallback(om2.MSceneMessage.kAfterNew, self._invalidate_cache),
+        ]
+
         # Signals
-        self.btn_refresh.clicked.connect(self.update_status)
+        self.btn_refresh.clicked.connect(self.refresh)
         self.btn_select.clicked.connect(self.select_all_curves)
         self.btn_apply_all.clicked.connect(self.apply_all)
         self.btn_apply_selected.clicked.connect(self.apply_selected)
 
         self.update_status()
 
+    def closeEvent(self, event):
+        if self._callbacks:
+            om2.MMessage.removeCallbacks(self._callbacks)
+            self._callbacks = []
+        super(ArnoldCurvesTool, self).closeEvent(event)
+
+    # ---- curve cache ----
+
+    def _invalidate_cache(self, *args):
+        self._curves_cache = None
+        self._last_apply_key = None
+
+    def _curves(self):
+        if self._curves_cache is None:
+            self._curves_cache = list_curve_shapes()
+        return self._curves_cache
+
+    # ---- grouping ----
+
+    def _similar_key(self, c):
+        # Get the parent transform's name for grouping
+        parent = get_parent_path(c)
+        # Fallback to shape name if no parent
+        short_name = (parent or c).rsplit('|', 1)[-1]
+        # if name is only digits keep it as is
+        return get_base_name(short_name) or short_name
+
+    def _group_key(self, c):
+        # Get the parent of the curve transform (the group)
+        transform_parent = get_parent_path(c)
+        if not transform_parent:
+            return "root"
+        # Use the group's full path to ensure unique grouping;
+        # a top-level transform is its own group
+        return get_parent_path(transform_parent) or transform_parent
+
     # ---- actions ----
 
+    def refresh(self):
+        self._invalidate_cache()
+        self.update_status()
+
     def update_status(self):
-        curves = list_curve_shapes()
+        curves = self._curves()
         self.status.setText(f"Found {len(curves)} curve shape(s).")
 
     def select_all_curves(self):
-        curves = list_curve_shapes()
+        curves = self._curves()
         if curves:
             cmds.select(curves, r=True)
         self.update_status()
@@ -229,150 +331,109 @@ class ArnoldCurvesTool(QtWidgets.QDialog):
             self.status.setText("No curve shapes found.")
             return
 
-        # Determine grouping
+        # Skip the whole pass when nothing changed since the last apply: same
+        # settings and curves, and no scene edit since (any edit or undo, e.g. in
+        # the Attribute Editor or deleting a shader, changes the undo queue top)
         if self.rb_same.isChecked():
-            # For "all same shader", use a generic name
-            groups = {"curve_shader": curves}
+            mode = "same"
+        elif self.rb_similar.isChecked():
+            mode = "similar"
         else:
-            from collections import defaultdict
-            groups = defaultdict(list)
-            for c in curves:
-                if self.rb_similar.isChecked():
-                    # Get the parent transform's name for grouping
-                    parent = cmds.listRelatives(c, parent=True, fullPath=True)
-                    if parent:
-                        parent_short = cmds.ls(parent[0], shortNames=True)[0]
-                        key = get_base_name(parent_short)
-                    else:
-                        # Fallback to shape name if no parent
-                        short_name = cmds.ls(c, shortNames=True)[0]
-                        key = get_base_name(short_name)
-                    if not key:  # if name is only digits
-                        key = parent_short if parent else short_name
-                elif self.rb_group.isChecked():
-                    # Get the parent of the curve transform (the group)
-                    transform_parent = cmds.listRelatives(c, parent=True, fullPath=True)
-                    if transform_parent:
-                        group_parent = cmds.listRelatives(transform_parent[0], parent=True, fullPath=True)
-                        if group_parent:
-                            # Use the group's full path to ensure unique grouping
-                            key = group_parent[0]
-                        else:
-                            # The transform itself is the top-level group
-                            key = transform_parent[0]
-                    else:
-                        key = "root"
-                groups[key].append(c)
+            mode = "group"
+        apply_key = (self.chk_render.isChecked(), self.spin_samples.value(), self.spin_width.value(),
+                     self.chk_assign_shader.isChecked(), mode, tuple(curves))
+        if (apply_key == self._last_apply_key and cmds.undoInfo(q=True, state=True)
+                and cmds.undoInfo(q=True, undoName=True) == self._last_apply_undo):
+            self.status.setText("Nothing changed since the last apply.")
+            return
 
-        total_connected = 0
-        shader_names = []
+        with _fast_batch():
+            # Determine grouping (radio state is read once, not per curve)
+            if mode == "same":
+                # For "all same shader", use a generic name
+                groups = {"curve_shader": curves}
+            else:
+                from collections import defaultdict
+                key_fn = self._similar_key if mode == "similar" else self._group_key
+                groups = defaultdict(list)
+                for c in curves:
+                    groups[key_fn(c)].append(c)
+
+            total_connected = 0
+            shader_names = []
         
-        # Only create/assign shaders if checkbox is enabled
-        if self.chk_assign_shader.isChecked():
-            for group_name, group_curves in groups.items():
-                # Extract clean name for shader
-                if self.rb_group.isChecked() and "|" in group_name:
-                    # For full paths, get the short name (don't remove digits for groups)
-                    short_name = cmds.ls(group_name, shortNames=True)[0]
-                    clean_name = short_name
-                elif self.rb_similar.isChecked():
-                    # For similar names, the key is already clean
-                    clean_name = group_name
-                else:
-                    clean_name = group_name
-                
-                shader_name = clean_name + "_shader"
-                shader = ensure_curve_shader(shader_name)
-                shader_names.append(shader_name)
-
-                # Set emission to 1.0 and random bright emission color
-                import random
-                safe_set_attr(shader, "emission", 1.0)
-                safe_set_attr(shader, "specular", 0.0)
-                safe_set_attr(shader, "base", 0.0)
-                
+            # Only create/assign shaders if checkbox is enabled
+            if self.chk_assign_shader.isChecked():
                 # Generate highly saturated colors by ensuring at least one channel is at max
-                # and others vary, avoiding muddy middle-range colors
-                color_choice = random.randint(0, 2)  # Which channel to max out
-                colors = [0, 0, 0]
-                
-                # Set the dominant channel to full
-                colors[color_choice] = 1.0
-                
-                # Set other channels to create variety (lower values for saturation)
-                for i in range(3):
-                    if i != color_choice:
-                        colors[i] = random.uniform(0.0, 0.6)
-                
-                r, g, b = colors
+                # and others vary, avoiding muddy middle-range colors (all groups at once)
+                n_groups = len(groups)
+                colors = np.random.uniform(0.0, 0.6, (n_groups, 3))  # lower values for saturation
+                colors[np.arange(n_groups), np.random.randint(0, 3, n_groups)] = 1.0  # dominant channel
+
+                for i, (group_name, group_curves) in enumerate(groups.items()):
+                    # Extract clean name for shader
+                    if mode == "group" and "|" in group_name:
+                        # For full paths, get the short name (don't remove digits for groups)
+                        clean_name = group_name.rsplit('|', 1)[-1]
+                    else:
+                        # For similar names, the key is already clean
+                        clean_name = group_name
                 
-                # Set emission color (not base color)
-                safe_set_attr(shader, "emissionColor", (r, g, b))
-
-                # Connect shader (this will overwrite existing connections)
-                n_connected = connect_shader_to_curve_slot(group_curves, shader)
-                total_connected += n_connected
-
-        # Set Arnold curve attributes to all curves
-        render_on = self.chk_render.isChecked()
-        samples = self.spin_samples.value()
-        width = self.spin_width.value()
-        set_curve_render_attrs(curves, render_on, samples, width)
-
-        status_msg = f'Applied to {len(curves)} curve(s) in {len(groups)} group(s): '
-        status_msg += f'RenderCurve={render_on} | SampleRate={samples} | Width={width}'
-        if self.chk_assign_shader.isChecked() and shader_names:
-            status_msg += f' | Shaders: {", ".join(shader_names)} (connected on {total_connected} shape(s))'
+                    shader_name = clean_name + "_shader"
+                    shader = ensure_curve_shader(shader_name)
+                    shader_names.append(shader_name)
+
+                    # Set emission to 1.0 and random bright emission color
+                    safe_set_attr(shader, "emission", 1.0)
+                    safe_set_attr(shader, "specular", 0.0)
+                    safe_set_attr(shader, "base", 0.0)
+
+                    # Set emission color (not base color)
+                    safe_set_attr(shader, "emissionColor", tuple(colors[i].tolist()))
+
+                    # Connect shader (this will overwrite existing connections)
+                    n_connected = connect_shader_to_curve_slot(group_curves, shader)
+                    total_connected += n_connected
+
+            # Set Arnold curve attributes to all curves
+            render_on = self.chk_render.isChecked()
+            samples = self.spin_samples.value()
+            width = self.spin_width.value()
+            set_curve_render_attrs(curves, render_on, samples, width)
+
+            status_msg = f'Applied to {len(curves)} curve(s) in {len(groups)} group(s): '
+            status_msg += f'RenderCurve={render_on} | SampleRate={samples} | Width={width}'
+            if self.chk_assign_shader.isChecked() and shader_names:
+                status_msg += f' | Shaders: {", ".join(shader_names)} (connected on {total_connected} shape(s))'
         
-        self.status.setText(status_msg)
+            self.status.setText(status_msg)
+        self._last_apply_key = apply_key
+        self._last_apply_undo = cmds.undoInfo(q=True, undoName=True)
 
     def apply_all(self):
-        curves = list_curve_shapes()
+        curves = self._curves()
         self.apply_curves(curves)
 
     def apply_selected(self):
-        # Get all selected objects and find their curve shapes
-        selected = cmds.ls(selection=True, long=True) or []
-        curves = []
-        
-        for obj in selected:
-            # Check if selected object is a transform
-            if cmds.nodeType(obj) == "transform":
-                # Get curve shapes under this transform
-                shapes = cmds.listRelatives(obj, shapes=True, type="nurbsCurve", fullPath=True) or []
-                for s in shapes:
-                    try:
-                        if cmds.attributeQuery("intermediateObject", node=s, exists=True):
-                            if cmds.getAttr(s + ".intermediateObject"):
-                                continue
-                    except Exception:
-                        pass
-                    curves.append(s)
-            # Check if selected object is already a curve shape
-            elif cmds.nodeType(obj) == "nurbsCurve":
-                try:
-                    if cmds.attributeQuery("intermediateObject", node=obj, exists=True):
-                        if cmds.getAttr(obj + ".intermediateObject"):
-                            continue
-                except Exception:
-                    pass
-                curves.append(obj)
-        
+        # dag=True pulls in curve shapes under selected transforms/groups too
+        curves = cmds.ls(selection=True, long=True, dag=True, type="nurbsCurve",
+                         noIntermediate=True) or []
         self.apply_curves(curves)
 
 # ---------- launcher ----------
 
 def show_arnold_curves_tool():
     # Close previous instance if open
-    for w in QtWidgets.QApplication.topLevelWidgets():
-        if w.objectName() == WINDOW_TITLE.replace(" ", "_"):
-            try:
-                w.close()
-                w.deleteLater()
-            except Exception:
-                pass
+    prev = _LAST_DLG[0] and _LAST_DLG[0]()
+    if prev:
+        try:
+            prev.close()
+            prev.deleteLater()
+        except Exception:
+            pass
     dlg = ArnoldCurvesTool()
     dlg.show()
+    _LAST_DLG[0] = weakref.ref(dlg)
     return dlg
 
 # Launch UI
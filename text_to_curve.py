@@ -5,6 +5,7 @@
 # ==============================================================
 
 import maya.cmds as cmds
+import maya.api.OpenMaya as om2
 
 # ----------------------------------------
 # Globals (kept minimal and namespaced)
@@ -16,9 +17,11 @@ _LINE_SPACING   = 1.3                    # vertical offset (in Maya units) betwe
 # ----------------------------------------
 # Core function – creates curves from one line of text
 # ----------------------------------------
-def create_curve_line(txt, font_family):
+def create_curve_line(txt, font_family, freeze=True):
     """
     Creates one line of NURBS curves from `txt` using `font_family`.
+    Pass freeze=False to skip the freeze/center pivot step when the caller
+    does it once for several lines.
     Returns the top‑level transform Maya gives us.
     """
     if not txt:
@@ -29,8 +32,9 @@ def create_curve_line(txt, font_family):
     grp = cmds.textCurves(ch=0, f=font_family if font_family else "Arial|w400|r", t=txt)[0]
 
     # Freeze + center pivot for tidy transforms
-    cmds.makeIdentity(grp, apply=True, t=True, r=True, s=True, n=False)
-    cmds.xform(grp, centerPivots=True)
+    if freeze:
+        cmds.makeIdentity(grp, apply=True, t=True, r=True, s=True, n=False)
+        cmds.xform(grp, centerPivots=True)
 
     return grp
 
@@ -58,24 +62,33 @@ def create_curves_from_ui(*_):
         return
 
     font = _CURVE_UI_FONT['family'] or 'Arial|w400|r'
+    font_short = font.split('|')[0]
     all_groups = []
     y_offset   = 0.0
 
-    # Build each line separately so we can stack them with spacing
+    # Build each line separately (all at the origin) so we can stack them with spacing
     for line in reversed(txt.splitlines() or ['']):      # bottom‑up for natural reading order
-        grp = create_curve_line(line, font)
+        grp = create_curve_line(line, font, freeze=False)
         if grp:
-            cmds.move(0, y_offset, 0, grp, r=True)
-            # measure height for next offset
-            bbox   = cmds.exactWorldBoundingBox(grp)
-            height = bbox[4] - bbox[1]   # Y‑size
-            y_offset += height * _LINE_SPACING
             all_groups.append(grp)
 
+    # Measure line heights from the API bounding boxes (the lines are still
+    # unmoved, so object space == world space) and stack them
+    sel = om2.MSelectionList()
+    for grp in all_groups:
+        sel.add(grp)
+    for i, grp in enumerate(all_groups):
+        if y_offset:
+            cmds.move(0, y_offset, 0, grp, r=True)
+        height = om2.MFnDagNode(sel.getDagPath(i)).boundingBox.height   # Y‑size
+        y_offset += height * _LINE_SPACING
+
     # Group all lines together
     if all_groups:
-        master = cmds.group(all_groups, n='{}Text_CURVES_GRP'.format(font.split('|')[0]))
-        cmds.xform(master, centerPivots=True)
+        master = cmds.group(all_groups, n='{}Text_CURVES_GRP'.format(font_short))
+        # Freeze the whole hierarchy once, then center every pivot in one call
+        cmds.makeIdentity(master, apply=True, t=True, r=True, s=True, n=False)
+        cmds.xform(all_groups + [master], centerPivots=True)
         cmds.select(master)
         print('Created curve group:', master)
 